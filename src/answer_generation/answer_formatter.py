@@ -1,5 +1,4 @@
 from typing import List
-from datetime import datetime
 from .answer_generator import GeneratedAnswer, Citation
 
 class AnswerFormatter:
@@ -29,11 +28,8 @@ class AnswerFormatter:
             parts.append(f"Version: {citation.version}")
             
         if citation.last_updated:
-            try:
-                date = datetime.fromisoformat(citation.last_updated)
-                parts.append(f"Last Updated: {date.strftime('%Y-%m-%d')}")
-            except ValueError:
-                parts.append(f"Last Updated: {citation.last_updated}")
+            # Dates are pre-formatted at document-load time
+            parts.append(f"Last Updated: {citation.last_updated}")
         
         confidence_indicator = AnswerFormatter._format_confidence_indicator(citation.confidence)
         parts.append(f"({confidence_indicator})")
@@ -58,8 +54,7 @@ class AnswerFormatter:
                         info_parts.append(f"💡 **Upgrade Available**: Version {generated_answer.version_info.next_version} is available.")
                         
                         if generated_answer.version_info.migration_info:
-                            info_parts.append("\n**Migration Guide:**")
-                            info_parts.append(generated_answer.version_info.migration_info)
+                            info_parts.append("**Migration Guide:**\n" + generated_answer.version_info.migration_info)
             
             # Add version differences warning if applicable
             elif generated_answer.has_outdated_info:
@@ -69,31 +64,34 @@ class AnswerFormatter:
         return info_parts
     
     @staticmethod
-    def format_answer(generated_answer: GeneratedAnswer) -> str:
-        """Format the complete answer with citations and warnings."""
-        parts = []
-        
-        # Add version information
-        version_info = AnswerFormatter._format_version_info(generated_answer)
-        if version_info:
-            parts.extend(version_info)
-            parts.append("")  # Add blank line after version info
-        
-        # Add conflicting information warning if applicable
+    def _iter_answer_parts(generated_answer: GeneratedAnswer):
+        """Yield each paragraph of the formatted answer in order.
+
+        Streaming the paragraphs into the final join avoids materializing an
+        intermediate parts list alongside the joined result.
+        """
+        # Version information
+        yield from AnswerFormatter._format_version_info(generated_answer)
+
+        # Conflicting information warning if applicable
         if generated_answer.has_conflicting_info:
-            parts.append("⚠️ **Note**: The available information contains some conflicts. Both perspectives are presented below.\n")
-        
-        # Add the main answer
-        parts.append(generated_answer.answer_text)
-        
-        # Add citations section if there are any
+            yield "⚠️ **Note**: The available information contains some conflicts. Both perspectives are presented below."
+
+        # The main answer
+        yield generated_answer.answer_text
+
+        # Citations section if there are any
         if generated_answer.citations:
-            parts.append("\n\n**Sources:**")
-            for citation in generated_answer.citations:
-                parts.append(f"- {AnswerFormatter._format_citation(citation)}")
-        
-        # Add overall confidence score
+            yield "**Sources:**\n" + "\n".join(
+                f"- {AnswerFormatter._format_citation(citation)}"
+                for citation in generated_answer.citations
+            )
+
+        # Overall confidence score
         overall_confidence = AnswerFormatter._format_confidence_indicator(generated_answer.confidence_score)
-        parts.append(f"\n**Overall Confidence**: {overall_confidence}")
-        
-        return "\n".join(parts) 
\ No newline at end of file
+        yield f"**Overall Confidence**: {overall_confidence}"
+
+    @staticmethod
+    def format_answer(generated_answer: GeneratedAnswer) -> str:
+        """Format the complete answer with citations and warnings."""
+        return "\n\n".join(AnswerFormatter._iter_answer_parts(generated_answer)) 
\ No newline at end of file
@@ -1,10 +1,74 @@
 from typing import List, Tuple, Dict, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
+import asyncio
 import re
 from langchain_core.documents import Document
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+from config.retrieval_config import NEGATION_PATTERNS
+
+# Maximum number of LLM requests kept in flight by the batch path
+LLM_MAX_CONCURRENCY = 8
+
+# Matches whole negation tokens only, so words like "notation" are untouched
+_NEGATION_RE = re.compile(r'\b(?:' + '|'.join(NEGATION_PATTERNS) + r')\b')
+
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]')
+
+# Single alternation covering "v1.0", "version 1.0" and "1.0 version" so one
+# scan suffices; the capture groups isolate the numeric part directly
+_VERSION_RE = re.compile(
+    r'(?:\bv|version\s+)(\d+\.\d+(?:\.\d+)?)|(\d+\.\d+(?:\.\d+)?)\s+version',
+    re.IGNORECASE
+)
+
+# "Step N:" -> "N." for any step count, and blank lines before list items
+_STEP_RE = re.compile(r'Step (\d+):')
+_LIST_RE = re.compile(r'\n(•|1\.)')
+
+@lru_cache(maxsize=32)
+def _migration_keyword_re(from_version: str, to_version: str) -> re.Pattern:
+    """One alternation finds every migration keyword in a single scan per
+    document; version pairs recur across queries, so the compiled pattern
+    is kept per pair instead of being rebuilt on every call. Keywords are
+    joined longest-first so a version that prefixes the other (2.1 vs
+    2.1.3) still gets matched and recorded."""
+    keywords = ('migration', 'upgrade', from_version, to_version)
+    return re.compile(
+        '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+    )
+
+# Static instructions go in the system message: the unchanging prefix lets
+# providers apply prompt caching, and only the dynamic slots are rebuilt
+_SYSTEM_PROMPT = """You answer customer support questions from the provided context.
+
+Requirements:
+1. If information is insufficient, start with "I don't have enough information about..."
+2. If there are conflicting pieces of information, acknowledge them explicitly
+3. If there are version differences, mention them clearly
+4. Format any technical steps using numbered lists or bullet points
+5. Be concise but comprehensive
+6. Do not make up information not present in the context
+7. If the query is about a specific version, focus on that version's information
+8. If features are only available in newer versions, mention the version requirements"""
+
+_USER_TEMPLATE = """Based on the following context, answer the question: {query}
+
+Context:
+{context}
+
+Answer:"""
+
+def _lc(doc: Document) -> str:
+    """Lowercased page content, cached on the document metadata so each
+    document is lowercased at most once per request."""
+    lower = doc.metadata.get('_content_lc')
+    if lower is None:
+        lower = doc.page_content.lower()
+        doc.metadata['_content_lc'] = lower
+    return lower
 
 @dataclass
 class Citation:
@@ -36,25 +100,83 @@ class GeneratedAnswer:
     version_info: Optional[VersionInfo] = None
     is_version_specific: bool = False
 
+class VersionIndex:
+    """Prebuilt ordering over a set of normalized version strings.
+
+    Sorting happens once at construction; rank lookups, latest-version and
+    next-version queries are all O(1) afterwards.
+    """
+
+    def __init__(self, versions, sort_key):
+        self.sorted: Tuple[str, ...] = tuple(sorted(versions, key=sort_key))
+        self.rank: Dict[str, int] = {v: i for i, v in enumerate(self.sorted)}
+
+    @property
+    def latest(self) -> str:
+        return self.sorted[-1]
+
+    def next_after(self, version: str) -> Optional[str]:
+        """Return the version released immediately after the given one."""
+        idx = self.rank.get(version)
+        if idx is not None and idx < len(self.sorted) - 1:
+            return self.sorted[idx + 1]
+        return None
+
+@dataclass
+class _AnswerPlan:
+    """Pre-LLM state shared by the single and batch generation paths."""
+    answer: Optional[GeneratedAnswer] = None  # set when no LLM call is needed
+    prompt: Optional[List[Tuple[str, str]]] = None  # (role, content) messages
+    cache_key: Optional[Tuple[str, Tuple[str, ...]]] = None
+    citations: List[Citation] = field(default_factory=list)
+    confidence_score: float = 0.0
+    has_conflicting: bool = False
+    outdated_versions: List[str] = field(default_factory=list)
+    version_info: Optional[VersionInfo] = None
+    is_version_specific: bool = False
+
 class AnswerGenerator:
+    # Below this mean retrieval score the answer is flagged insufficient and
+    # the LLM is not consulted at all
+    INSUFFICIENT_CONFIDENCE_THRESHOLD = 0.3
+
     def __init__(self):
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
-        
+
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=api_key
         )
+        # Cache of LLM answer text keyed on (query, retrieved doc ids) so
+        # repeated support questions skip the network round trip entirely
+        self._answer_cache: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        # The set of versions in the corpus is essentially static, so the
+        # sorted order and rank lookups can be reused across requests
+        self._version_index_cache: Dict[frozenset, VersionIndex] = {}
     
     def _extract_section(self, doc: Document) -> Optional[str]:
         """Extract section information from document content."""
         content = doc.page_content
-        # Look for markdown-style headers
-        headers = [line for line in content.split('\n') if line.startswith('#')]
-        if headers:
-            return headers[0].lstrip('#').strip()
+        # Look for the first markdown-style header without materializing
+        # every line of the document
+        idx = content.find('#')
+        while idx != -1:
+            if idx == 0 or content[idx - 1] == '\n':
+                end = content.find('\n', idx)
+                if end == -1:
+                    end = len(content)
+                return content[idx:end].lstrip('#').strip()
+            idx = content.find('#', idx + 1)
         return None
+
+    def _get_section(self, doc: Document) -> Optional[str]:
+        """Section lookup cached on the document so repeated citations of the
+        same chunk don't rescan its content."""
+        if '_section' not in doc.metadata:
+            doc.metadata['_section'] = self._extract_section(doc)
+        return doc.metadata['_section']
     
     def _normalize_version(self, version: str) -> str:
         """Normalize version string by removing 'v' prefix and ensuring proper format."""
@@ -77,147 +199,197 @@ class AnswerGenerator:
 
     def _extract_version_from_query(self, query: str) -> Optional[str]:
         """Extract version information from the query."""
-        # Match common version patterns
-        patterns = [
-            r'v\d+\.\d+(?:\.\d+)?',  # v1.0, v2.1.3
-            r'version\s+\d+\.\d+(?:\.\d+)?',  # version 1.0
-            r'\d+\.\d+(?:\.\d+)?\s+version'   # 1.0 version
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                version = match.group().lower().replace('version', '').strip()
-                return self._normalize_version(version)
+        match = _VERSION_RE.search(query)
+        if match:
+            return self._normalize_version(match.group(1) or match.group(2))
         return None
     
-    def _get_version_info(self, docs: List[Tuple[Document, float]], query_version: Optional[str] = None) -> VersionInfo:
-        """Get version information from available documents."""
-        versions = set()
-        for doc, _ in docs:
-            version = doc.metadata.get('version') or doc.metadata.get('user_version')
-            if version:
-                versions.add(self._normalize_version(version))
-        
+    def _get_doc_versions(self, docs: List[Tuple[Document, float]]) -> List[Optional[str]]:
+        """Extract the version of each document once, so downstream version
+        checks share a single metadata pass."""
+        return [
+            doc.metadata.get('version') or doc.metadata.get('user_version')
+            for doc, _ in docs
+        ]
+
+    def _get_version_info(self, doc_versions: List[Optional[str]], query_version: Optional[str] = None) -> VersionInfo:
+        """Get version information from available document versions."""
+        versions = {self._normalize_version(v) for v in doc_versions if v}
+
         if not versions:
             return None
-        
-        # Sort versions using version tuples
-        sorted_versions = sorted(versions, key=self._version_to_tuple)
-        latest_version = sorted_versions[-1]
-        
+
+        # Version ordering is memoized per distinct version set
+        cache_key = frozenset(versions)
+        version_index = self._version_index_cache.get(cache_key)
+        if version_index is None:
+            version_index = VersionIndex(versions, sort_key=self._version_to_tuple)
+            self._version_index_cache[cache_key] = version_index
+
         if query_version:
             query_version = self._normalize_version(query_version)
-            is_latest = query_version == latest_version
-            next_version = None
-            try:
-                version_idx = sorted_versions.index(query_version)
-                if version_idx < len(sorted_versions) - 1:
-                    next_version = sorted_versions[version_idx + 1]
-            except ValueError:
-                pass
-            
+
             return VersionInfo(
                 current_version=query_version,
-                available_versions=sorted_versions,
-                is_latest=is_latest,
-                next_version=next_version
+                available_versions=version_index.sorted,
+                is_latest=query_version == version_index.latest,
+                next_version=version_index.next_after(query_version)
             )
-        
+
         return VersionInfo(
-            current_version=latest_version,
-            available_versions=sorted_versions,
+            current_version=version_index.latest,
+            available_versions=version_index.sorted,
             is_latest=True
         )
     
-    def _filter_version_specific_docs(self, docs: List[Tuple[Document, float]], version: str) -> List[Tuple[Document, float]]:
-        """Filter documents to match specific version."""
+    def _filter_version_specific_docs(
+        self,
+        docs: List[Tuple[Document, float]],
+        doc_versions: List[Optional[str]],
+        version: str
+    ) -> Tuple[List[Tuple[Document, float]], List[Optional[str]]]:
+        """Filter documents (and their parallel version list) to match a specific version."""
         version = self._normalize_version(version)
         filtered_docs = []
-        for doc, score in docs:
-            doc_version = doc.metadata.get('version') or doc.metadata.get('user_version')
+        filtered_versions = []
+        for (doc, score), doc_version in zip(docs, doc_versions):
             if doc_version and self._normalize_version(doc_version) == version:
                 filtered_docs.append((doc, score * 1.2))  # Boost score for version-specific matches
-        return filtered_docs if filtered_docs else docs  # Fall back to all docs if no version matches
+                filtered_versions.append(doc_version)
+        if filtered_docs:
+            return filtered_docs, filtered_versions
+        return docs, doc_versions  # Fall back to all docs if no version matches
     
     def _get_migration_info(self, docs: List[Tuple[Document, float]], from_version: str, to_version: str) -> Optional[str]:
         """Extract migration information between versions."""
+        keyword_re = _migration_keyword_re(from_version, to_version)
         migration_docs = []
         for doc, _ in docs:
-            content = doc.page_content.lower()
-            if ('migration' in content or 'upgrade' in content) and \
-               (from_version in content and to_version in content):
+            hits = {match.group() for match in keyword_re.finditer(_lc(doc))}
+            if ({'migration', 'upgrade'} & hits) and from_version in hits and to_version in hits:
                 migration_docs.append(doc)
-        
+
         if migration_docs:
             return "\n".join([doc.page_content for doc in migration_docs])
         return None
     
-    def _check_version_conflicts(self, docs: List[Tuple[Document, float]]) -> List[str]:
-        """Identify different versions present in retrieved documents."""
-        versions = set()
-        for doc, _ in docs:
-            version = doc.metadata.get('version') or doc.metadata.get('user_version')
-            if version:
-                versions.add(version)
-        return list(versions) if len(versions) > 1 else []
+    def _check_version_conflicts(self, doc_versions: List[Optional[str]]) -> List[str]:
+        """Identify different versions present in retrieved documents.
+
+        The common single-version case is handled with one comparison per
+        document; the distinct-version set is only built once a second
+        version is actually seen.
+        """
+        first = None
+        distinct = None
+        for version in doc_versions:
+            if not version or version == first:
+                continue
+            if first is None:
+                first = version
+            elif distinct is None:
+                distinct = {first, version}
+            else:
+                distinct.add(version)
+        return list(distinct) if distinct else []
     
     def _format_technical_steps(self, text: str) -> str:
         """Format technical instructions with proper markdown."""
         # Convert "Step X:" pattern to numbered list
-        text = text.replace("Step 1:", "1.")
-        text = text.replace("Step 2:", "2.")
-        text = text.replace("Step 3:", "3.")
-        
+        text = _STEP_RE.sub(r'\1.', text)
+
         # Add newlines before lists for proper markdown rendering
-        text = text.replace("\n•", "\n\n•")
-        text = text.replace("\n1.", "\n\n1.")
-        
+        text = _LIST_RE.sub(r'\n\n\1', text)
+
         return text
     
-    def _create_citation(self, doc: Document, score: float) -> Citation:
+    def _create_citation(self, doc: Document, score: float, version: Optional[str] = None) -> Citation:
         """Create a citation object from a document."""
         return Citation(
             doc_id=doc.metadata.get('id', 'unknown'),
             doc_title=doc.metadata.get('title', 'Untitled'),
             doc_type=doc.metadata.get('source', 'unknown'),
-            section=self._extract_section(doc),
+            section=self._get_section(doc),
             confidence=score,
-            version=doc.metadata.get('version') or doc.metadata.get('user_version'),
-            last_updated=doc.metadata.get('last_updated') or doc.metadata.get('resolved_date')
+            version=version or doc.metadata.get('version') or doc.metadata.get('user_version'),
+            last_updated=doc.metadata.get('last_updated_fmt')
+            or doc.metadata.get('resolved_date_fmt')
+            or doc.metadata.get('last_updated')
+            or doc.metadata.get('resolved_date')
         )
     
     def _has_conflicting_information(self, docs: List[Tuple[Document, float]]) -> bool:
-        """Check if there are conflicting pieces of information."""
-        seen_content = set()
+        """Check if there are conflicting pieces of information.
+
+        Sentences are normalized by stripping negation tokens; two sentences
+        that share the same normalized token set but differ in negation
+        polarity are treated as a conflict.
+        """
+        seen_polarity: Dict[int, bool] = {}
         for doc, _ in docs:
-            content_key = doc.page_content.lower()
-            if "not" in content_key and content_key.replace("not", "").strip() in seen_content:
-                return True
-            seen_content.add(content_key)
+            for sentence in _SENTENCE_SPLIT_RE.split(_lc(doc)):
+                stripped, negations = _NEGATION_RE.subn('', sentence)
+                tokens = frozenset(stripped.split())
+                if not tokens:
+                    continue
+                key = hash(tokens)
+                polarity = bool(negations)
+                if key in seen_polarity:
+                    if seen_polarity[key] != polarity:
+                        return True
+                else:
+                    seen_polarity[key] = polarity
         return False
     
-    def generate_answer(self, query: str, retrieved_docs: List[Tuple[Document, float]], user_version: Optional[str] = None) -> GeneratedAnswer:
-        """Generate a comprehensive answer with citations and handle edge cases."""
+    def _plan_answer(self, query: str, retrieved_docs: List[Tuple[Document, float]], user_version: Optional[str] = None) -> _AnswerPlan:
+        """Run all pre-LLM work for a query: version handling, citations,
+        edge-case detection and prompt construction."""
         if not retrieved_docs:
-            return GeneratedAnswer(
-                answer_text="I don't have enough information to answer this question.",
-                citations=[],
-                confidence_score=0.0,
-                has_insufficient_info=True,
-                has_conflicting_info=False,
-                has_outdated_info=False,
-                outdated_versions=[]
+            return _AnswerPlan(
+                answer=GeneratedAnswer(
+                    answer_text="I don't have enough information to answer this question.",
+                    citations=[],
+                    confidence_score=0.0,
+                    has_insufficient_info=True,
+                    has_conflicting_info=False,
+                    has_outdated_info=False,
+                    outdated_versions=[]
+                )
             )
-        
+
+        # Extract per-document metadata once; every version check below
+        # reads from this parallel list instead of re-hitting the dicts
+        doc_versions = self._get_doc_versions(retrieved_docs)
+
+        # Confidence is known from the retrieval scores alone; when it is
+        # already below the insufficient threshold, skip the LLM round trip
+        confidence_score = sum(score for _, score in retrieved_docs) / len(retrieved_docs)
+        if confidence_score < self.INSUFFICIENT_CONFIDENCE_THRESHOLD:
+            return _AnswerPlan(
+                answer=GeneratedAnswer(
+                    answer_text="I don't have enough information about this topic.",
+                    citations=[
+                        self._create_citation(doc, score, version)
+                        for (doc, score), version in zip(retrieved_docs, doc_versions)
+                    ],
+                    confidence_score=confidence_score,
+                    has_insufficient_info=True,
+                    has_conflicting_info=False,
+                    has_outdated_info=False,
+                    outdated_versions=[]
+                )
+            )
+
         # Extract version from query if not provided
         query_version = user_version or self._extract_version_from_query(query)
-        version_info = self._get_version_info(retrieved_docs, query_version)
-        
+        version_info = self._get_version_info(doc_versions, query_version)
+
         # Filter and prioritize version-specific documents
         if query_version:
-            retrieved_docs = self._filter_version_specific_docs(retrieved_docs, query_version)
-            
+            retrieved_docs, doc_versions = self._filter_version_specific_docs(
+                retrieved_docs, doc_versions, query_version
+            )
+
             # Get migration info if asking about newer version features
             if version_info and version_info.next_version:
                 migration_info = self._get_migration_info(
@@ -229,10 +401,13 @@ class AnswerGenerator:
                     version_info.migration_info = migration_info
         
         # Create citations
-        citations = [self._create_citation(doc, score) for doc, score in retrieved_docs]
-        
+        citations = [
+            self._create_citation(doc, score, version)
+            for (doc, score), version in zip(retrieved_docs, doc_versions)
+        ]
+
         # Check for edge cases
-        outdated_versions = self._check_version_conflicts(retrieved_docs)
+        outdated_versions = self._check_version_conflicts(doc_versions)
         has_conflicting = self._has_conflicting_information(retrieved_docs)
         
         # Prepare context for LLM
@@ -245,39 +420,88 @@ class AnswerGenerator:
             context_parts.append(f"Migration Information: {version_info.migration_info}")
         
         context = "\n\n".join(context_parts)
-        
-        # Generate answer using LLM
-        prompt = f"""Based on the following context, answer the question: {query}
 
-Context:
-{context}
+        # Static system message plus the per-request user message
+        prompt = [
+            ("system", _SYSTEM_PROMPT),
+            ("human", _USER_TEMPLATE.format(query=query, context=context))
+        ]
 
-Requirements:
-1. If information is insufficient, start with "I don't have enough information about..."
-2. If there are conflicting pieces of information, acknowledge them explicitly
-3. If there are version differences, mention them clearly
-4. Format any technical steps using numbered lists or bullet points
-5. Be concise but comprehensive
-6. Do not make up information not present in the context
-7. If the query is about a specific version, focus on that version's information
-8. If features are only available in newer versions, mention the version requirements
+        # Recalculate overall confidence over the (possibly boosted) final doc set
+        confidence_score = sum(score for _, score in retrieved_docs) / len(retrieved_docs)
 
-Answer:"""
+        cache_key = (query, tuple(citation.doc_id for citation in citations))
 
-        response = self.llm.invoke(prompt)
-        answer_text = self._format_technical_steps(response.content)
-        
-        # Calculate overall confidence
-        confidence_score = sum(score for _, score in retrieved_docs) / len(retrieved_docs)
-        
-        return GeneratedAnswer(
-            answer_text=answer_text,
+        return _AnswerPlan(
+            prompt=prompt,
+            cache_key=cache_key,
             citations=citations,
             confidence_score=confidence_score,
-            has_insufficient_info=confidence_score < 0.3,
-            has_conflicting_info=has_conflicting,
-            has_outdated_info=bool(outdated_versions),
+            has_conflicting=has_conflicting,
             outdated_versions=outdated_versions,
             version_info=version_info,
             is_version_specific=bool(query_version)
-        ) 
\ No newline at end of file
+        )
+
+    def _finalize_answer(self, plan: _AnswerPlan, response_text: str) -> GeneratedAnswer:
+        """Build the final GeneratedAnswer from a plan and the LLM response."""
+        answer_text = self._format_technical_steps(response_text)
+
+        return GeneratedAnswer(
+            answer_text=answer_text,
+            citations=plan.citations,
+            confidence_score=plan.confidence_score,
+            has_insufficient_info=plan.confidence_score < self.INSUFFICIENT_CONFIDENCE_THRESHOLD,
+            has_conflicting_info=plan.has_conflicting,
+            has_outdated_info=bool(plan.outdated_versions),
+            outdated_versions=plan.outdated_versions,
+            version_info=plan.version_info,
+            is_version_specific=plan.is_version_specific
+        )
+
+    def generate_answer(self, query: str, retrieved_docs: List[Tuple[Document, float]], user_version: Optional[str] = None) -> GeneratedAnswer:
+        """Generate a comprehensive answer with citations and handle edge cases."""
+        plan = self._plan_answer(query, retrieved_docs, user_version)
+        if plan.answer is not None:
+            return plan.answer
+
+        response_text = self._answer_cache.get(plan.cache_key)
+        if response_text is None:
+            response_text = self.llm.invoke(plan.prompt).content
+            self._answer_cache[plan.cache_key] = response_text
+
+        return self._finalize_answer(plan, response_text)
+
+    async def _agenerate_answers(self, queries: List[str], retrieved_docs_list: List[List[Tuple[Document, float]]], user_versions: Optional[List[Optional[str]]] = None) -> List[GeneratedAnswer]:
+        """Generate answers for multiple queries with one batched LLM call."""
+        if user_versions is None:
+            user_versions = [None] * len(queries)
+
+        plans = [
+            self._plan_answer(query, retrieved_docs, user_version)
+            for query, retrieved_docs, user_version in zip(queries, retrieved_docs_list, user_versions)
+        ]
+
+        # Only queries without a planned answer or a cached response need the LLM
+        pending = [
+            (i, plan) for i, plan in enumerate(plans)
+            if plan.answer is None and plan.cache_key not in self._answer_cache
+        ]
+
+        if pending:
+            responses = await self.llm.abatch(
+                [plan.prompt for _, plan in pending],
+                config={"max_concurrency": LLM_MAX_CONCURRENCY}
+            )
+            for (_, plan), response in zip(pending, responses):
+                self._answer_cache[plan.cache_key] = response.content
+
+        return [
+            plan.answer if plan.answer is not None
+            else self._finalize_answer(plan, self._answer_cache[plan.cache_key])
+            for plan in plans
+        ]
+
+    def generate_answers_batch(self, queries: List[str], retrieved_docs_list: List[List[Tuple[Document, float]]], user_versions: Optional[List[Optional[str]]] = None) -> List[GeneratedAnswer]:
+        """Synchronous wrapper around the batched async generation path."""
+        return asyncio.run(self._agenerate_answers(queries, retrieved_docs_list, user_versions)) 
\ No newline at end of file
@@ -15,9 +15,20 @@ CHUNK_OVERLAP = 200
 
 # Vector store settings
 COLLECTION_NAME = "cloudsync_support"
+CHROMA_INSERT_BATCH = 100  # Rows per Chroma insert; amortizes per-insert transaction cost
+
+# HNSW index settings for the collection: cosine space with a denser graph
+# keeps query time sub-linear as the corpus grows
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200
+}
 
 # Embedding settings
 EMBEDDING_MODEL = "models/embedding-001"  # Google's embedding model
+EMBED_BATCH_SIZE = 100  # Chunks per embedding API call
+EMBED_CACHE_FILE = BASE_DIR / "embedding_cache.sqlite3"  # On-disk embedding cache
 
 # Document types
 DOC_TYPES = {
@@ -66,4 +66,11 @@ KEYWORD_SETTINGS = {
 
 # Re-ranking settings
 RERANK_TOP_K = 20  # Number of initial results to re-rank
-FINAL_RESULTS_K = 5  # Number of results to return after re-ranking 
\ No newline at end of file
+FINAL_RESULTS_K = 5  # Number of results to return after re-ranking
+
+# Semantic query cache settings
+QUERY_CACHE_SETTINGS = {
+    "similarity_threshold": 0.95,  # Minimum cosine similarity for a cache hit
+    "ttl": timedelta(hours=1),  # Entries older than this are evicted
+    "max_entries": 1000  # Hard cap on cached queries
+} 
\ No newline at end of file
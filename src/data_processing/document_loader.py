@@ -1,64 +1,110 @@
-import json
-from typing import List, Dict, Any
+import asyncio
+import orjson
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from langchain_core.documents import Document
 from config.config import DOC_TYPES, PRODUCT_DOCS_FILE, SUPPORT_TICKETS_FILE
 
+def _format_date(value: Optional[str]) -> Optional[str]:
+    """Pre-render an ISO date as YYYY-MM-DD for display in citations.
+
+    Parsing here, once per document at load time, saves re-parsing the same
+    dates every time a citation is rendered. Unparseable values pass through.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d')
+    except ValueError:
+        return value
+
+@lru_cache(maxsize=1)
+def _load_product_docs(mtime: float) -> Tuple[Document, ...]:
+    """Parse the product docs file; cached until the file's mtime changes."""
+    with open(PRODUCT_DOCS_FILE, 'rb') as f:
+        data = orjson.loads(f.read())
+        docs = []
+        for doc in data['product_docs']:
+            docs.append(
+                Document(
+                    page_content=doc['content'],
+                    metadata={
+                        'source': DOC_TYPES['PRODUCT_DOC'],
+                        'id': doc['id'],
+                        'title': doc['title'],
+                        'type': doc['type'],
+                        'version': doc['version'],
+                        'tags': doc['tags'],
+                        'last_updated': doc.get('last_updated'),
+                        'last_updated_fmt': _format_date(doc.get('last_updated'))
+                    }
+                )
+            )
+        return tuple(docs)
+
+@lru_cache(maxsize=1)
+def _load_support_tickets(mtime: float) -> Tuple[Document, ...]:
+    """Parse the support tickets file; cached until the file's mtime changes."""
+    with open(SUPPORT_TICKETS_FILE, 'rb') as f:
+        data = orjson.loads(f.read())
+        docs = []
+        for ticket in data['support_tickets']:
+            docs.append(
+                Document(
+                    page_content=ticket['content'],
+                    metadata={
+                        'source': DOC_TYPES['SUPPORT_TICKET'],
+                        'id': ticket['id'],
+                        'title': ticket['title'],
+                        'status': ticket['status'],
+                        'category': ticket['category'],
+                        'priority': ticket['priority'],
+                        'user_version': ticket['user_version'],
+                        'created_date': ticket['created_date'],
+                        'resolved_date': ticket['resolved_date'],
+                        'resolved_date_fmt': _format_date(ticket['resolved_date']),
+                        'tags': ticket['tags']
+                    }
+                )
+            )
+        return tuple(docs)
+
 class CloudSyncDocumentLoader:
     """Loader for CloudSync documentation and support tickets."""
-    
+
     @staticmethod
     def load_product_docs() -> List[Document]:
         """Load product documentation from JSON file."""
-        with open(PRODUCT_DOCS_FILE, 'r') as f:
-            data = json.load(f)
-            docs = []
-            for doc in data['product_docs']:
-                docs.append(
-                    Document(
-                        page_content=doc['content'],
-                        metadata={
-                            'source': DOC_TYPES['PRODUCT_DOC'],
-                            'id': doc['id'],
-                            'title': doc['title'],
-                            'type': doc['type'],
-                            'version': doc['version'],
-                            'tags': doc['tags'],
-                            'last_updated': doc.get('last_updated')
-                        }
-                    )
-                )
-            return docs
-    
+        return list(_load_product_docs(os.path.getmtime(PRODUCT_DOCS_FILE)))
+
     @staticmethod
     def load_support_tickets() -> List[Document]:
         """Load support tickets from JSON file."""
-        with open(SUPPORT_TICKETS_FILE, 'r') as f:
-            data = json.load(f)
-            docs = []
-            for ticket in data['support_tickets']:
-                docs.append(
-                    Document(
-                        page_content=ticket['content'],
-                        metadata={
-                            'source': DOC_TYPES['SUPPORT_TICKET'],
-                            'id': ticket['id'],
-                            'title': ticket['title'],
-                            'status': ticket['status'],
-                            'category': ticket['category'],
-                            'priority': ticket['priority'],
-                            'user_version': ticket['user_version'],
-                            'created_date': ticket['created_date'],
-                            'resolved_date': ticket['resolved_date'],
-                            'tags': ticket['tags']
-                        }
-                    )
-                )
-            return docs
-    
+        return list(_load_support_tickets(os.path.getmtime(SUPPORT_TICKETS_FILE)))
+
+    @staticmethod
+    async def aload_product_docs() -> List[Document]:
+        """Async variant; the blocking read/parse runs in a worker thread."""
+        return await asyncio.to_thread(CloudSyncDocumentLoader.load_product_docs)
+
+    @staticmethod
+    async def aload_support_tickets() -> List[Document]:
+        """Async variant; the blocking read/parse runs in a worker thread."""
+        return await asyncio.to_thread(CloudSyncDocumentLoader.load_support_tickets)
+
+    @classmethod
+    async def aload_all_documents(cls) -> List[Document]:
+        """Load both sources concurrently so neither blocks the other."""
+        product_docs, support_tickets = await asyncio.gather(
+            cls.aload_product_docs(),
+            cls.aload_support_tickets()
+        )
+        return product_docs + support_tickets
+
     @classmethod
     def load_all_documents(cls) -> List[Document]:
         """Load all documents from both sources."""
-        product_docs = cls.load_product_docs()
-        support_tickets = cls.load_support_tickets()
-        return product_docs + support_tickets 
\ No newline at end of file
+        return asyncio.run(cls.aload_all_documents())
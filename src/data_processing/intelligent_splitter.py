@@ -1,14 +1,24 @@
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from utils.text_processing import (
-    extract_numbered_lists,
-    identify_section_boundaries,
-    find_step_sequences,
-    merge_overlapping_regions
-)
+from utils.text_processing import Region, scan_preserve_regions
 from config.config import CHUNK_SIZE, CHUNK_OVERLAP
 
+# Below this document count splitting stays serial; worker start-up would
+# cost more than the regex/text scans being parallelized
+PARALLEL_SPLIT_THRESHOLD = 16
+
+# One splitter per worker process, created by the pool initializer
+_worker_splitter = None
+
+def _init_split_worker(chunk_size: int, chunk_overlap: int) -> None:
+    global _worker_splitter
+    _worker_splitter = IntelligentSplitter(chunk_size, chunk_overlap)
+
+def _split_one(doc: Document) -> List[Document]:
+    return _worker_splitter._split_single_document(doc)
+
 class IntelligentSplitter:
     """
     Intelligent document splitter that preserves document structure and context.
@@ -22,82 +32,109 @@ class IntelligentSplitter:
             chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
+        # Shared splitter for oversized preserve regions; constructing one
+        # per region would recompile its separators every time
+        self.large_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size * 2,
+            chunk_overlap=chunk_overlap * 2
+        )
     
-    def _identify_preserve_regions(self, text: str) -> List[dict]:
+    def _identify_preserve_regions(self, text: str) -> List[Region]:
         """
         Identify regions in text that should be preserved together.
         """
-        # Find all special regions
-        numbered_lists = extract_numbered_lists(text)
-        sections = identify_section_boundaries(text)
-        step_sequences = find_step_sequences(text)
-        
-        # Combine all regions
-        all_regions = numbered_lists + sections + step_sequences
-        
-        # Merge overlapping regions
-        return merge_overlapping_regions(all_regions)
+        # Single fused scan finds and merges all special regions
+        return scan_preserve_regions(text)
     
-    def _split_with_preserved_regions(self, text: str, preserve_regions: List[dict]) -> List[str]:
+    def _split_gap_text(self, gap_text: str, chunks: List[str]) -> None:
+        """
+        Append the chunks for one gap between preserve regions.
+
+        Gaps shorter than the chunk size already fit in a single chunk, so
+        they skip the recursive separator search entirely.
+        """
+        if not gap_text.strip():
+            return
+        if len(gap_text) <= self.chunk_size:
+            chunks.append(gap_text.strip())
+        else:
+            chunks.extend(self.base_splitter.split_text(gap_text))
+
+    def _split_with_preserved_regions(self, text: str, preserve_regions: List[Region]) -> List[str]:
         """
         Split text while keeping preserved regions intact.
         """
         chunks = []
         last_end = 0
-        
+
         for region in preserve_regions:
             # Split text before region if it exists
-            if last_end < region['start']:
-                pre_text = text[last_end:region['start']]
-                if pre_text.strip():
-                    chunks.extend(self.base_splitter.split_text(pre_text))
-            
-            # Add the preserved region as a whole
-            region_text = region['content']
-            if len(region_text) > self.chunk_size * 2:
+            if last_end < region.start:
+                self._split_gap_text(text[last_end:region.start], chunks)
+
+            # Add the preserved region as a whole; the size check runs on
+            # offsets so content is only sliced once it is actually used
+            if region.end - region.start > self.chunk_size * 2:
                 # If region is too large, split it with larger chunk size
-                temp_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=self.chunk_size * 2,
-                    chunk_overlap=self.chunk_overlap * 2
-                )
-                chunks.extend(temp_splitter.split_text(region_text))
+                chunks.extend(self.large_splitter.split_text(region.content))
             else:
-                chunks.append(region_text)
-            
-            last_end = region['end']
+                chunks.append(region.content)
+
+            last_end = region.end
         
         # Split any remaining text
         if last_end < len(text):
-            remaining_text = text[last_end:]
-            if remaining_text.strip():
-                chunks.extend(self.base_splitter.split_text(remaining_text))
-        
+            self._split_gap_text(text[last_end:], chunks)
+
         return chunks
     
+    def _split_single_document(self, doc: Document) -> List[Document]:
+        """
+        Split one document while preserving important structure and metadata.
+        """
+        # Identify regions to preserve
+        preserve_regions = self._identify_preserve_regions(doc.page_content)
+
+        # Split the document
+        chunks = self._split_with_preserved_regions(doc.page_content, preserve_regions)
+
+        # Create new documents for each chunk
+        return [
+            Document(
+                page_content=chunk,
+                metadata={
+                    **doc.metadata,
+                    'chunk_id': i,
+                    'total_chunks': len(chunks)
+                }
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+
+    def iter_split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Yield split chunks one document at a time, so consumers can ingest
+        incrementally without the whole chunk list ever being materialized.
+        """
+        for doc in documents:
+            yield from self._split_single_document(doc)
+
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """
         Split documents while preserving important structure and metadata.
+
+        Each document is independent, so large corpora are split in parallel
+        across CPU cores; small inputs stay on the serial path.
         """
-        split_docs = []
-        
-        for doc in documents:
-            # Identify regions to preserve
-            preserve_regions = self._identify_preserve_regions(doc.page_content)
-            
-            # Split the document
-            chunks = self._split_with_preserved_regions(doc.page_content, preserve_regions)
-            
-            # Create new documents for each chunk
-            for i, chunk in enumerate(chunks):
-                split_docs.append(
-                    Document(
-                        page_content=chunk,
-                        metadata={
-                            **doc.metadata,
-                            'chunk_id': i,
-                            'total_chunks': len(chunks)
-                        }
-                    )
-                )
-        
-        return split_docs 
\ No newline at end of file
+        if len(documents) < PARALLEL_SPLIT_THRESHOLD:
+            split_docs = []
+            for doc in documents:
+                split_docs.extend(self._split_single_document(doc))
+            return split_docs
+
+        with ProcessPoolExecutor(
+            initializer=_init_split_worker,
+            initargs=(self.chunk_size, self.chunk_overlap)
+        ) as executor:
+            results = executor.map(_split_one, documents, chunksize=4)
+            return [split_doc for result in results for split_doc in result] 
\ No newline at end of file
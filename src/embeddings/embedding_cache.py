@@ -0,0 +1,73 @@
+import hashlib
+import sqlite3
+from typing import List, Optional
+
+import numpy as np
+
+from config.config import EMBED_CACHE_FILE
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings keyed by content hash.
+
+    Chunks whose text has not changed between indexing runs hit the cache
+    and skip the embedding API entirely. Vectors are stored as int8 blobs
+    with a per-vector scale (scale = max|v| / 127), a quarter of the
+    float32 size; the quantization error is well below the noise floor of
+    cosine ranking.
+    """
+
+    def __init__(self, db_path=EMBED_CACHE_FILE):
+        self._conn = sqlite3.connect(str(db_path))
+        # Caches written by the earlier float16 layout have no scale
+        # column and cannot be read back; rebuild them
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if columns and 'scale' not in columns:
+            logger.info("Rebuilding embedding cache with quantized layout")
+            self._conn.execute("DROP TABLE embeddings")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vector BLOB, scale REAL)"
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode('utf-8')).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached vectors for each text; misses are returned as None
+        in the matching position.
+        """
+        results = []
+        for text in texts:
+            row = self._conn.execute(
+                "SELECT vector, scale FROM embeddings WHERE hash = ?", (self._key(text),)
+            ).fetchone()
+            if row is None:
+                results.append(None)
+            else:
+                quantized = np.frombuffer(row[0], dtype=np.int8)
+                results.append((quantized.astype(np.float32) * row[1]).tolist())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """
+        Store freshly computed vectors for the given texts.
+        """
+        rows = []
+        for text, vector in zip(texts, vectors):
+            values = np.asarray(vector, dtype=np.float32)
+            scale = float(np.abs(values).max()) / 127 or 1.0
+            quantized = np.clip(np.round(values / scale), -128, 127).astype(np.int8)
+            rows.append((self._key(text), quantized.tobytes(), scale))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, vector, scale) VALUES (?, ?, ?)",
+            rows
+        )
+        self._conn.commit()
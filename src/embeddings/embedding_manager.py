@@ -3,15 +3,26 @@ from langchain_core.documents import Document
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_community.vectorstores.utils import filter_complex_metadata
-from config.config import EMBEDDING_MODEL, COLLECTION_NAME, CHROMA_DIR
+from config.config import EMBEDDING_MODEL, COLLECTION_NAME, CHROMA_DIR, EMBED_BATCH_SIZE, CHROMA_INSERT_BATCH, HNSW_SETTINGS
+from config.retrieval_config import DOC_TYPE_PRIORITIES
+from .embedding_cache import EmbeddingCache
+import asyncio
 import os
 import socket
+import sqlite3
 import time
+from datetime import datetime
+from uuid import uuid4
 from google.api_core import retry
 import logging
 
 logger = logging.getLogger(__name__)
 
+_MAX_DOC_PRIORITY = max(DOC_TYPE_PRIORITIES.values())
+
+# Embedding batches kept in flight at once during ingestion
+EMBED_CONCURRENCY = 8
+
 class EmbeddingManager:
     """
     Manages document embeddings and vector store operations.
@@ -61,58 +72,202 @@ class EmbeddingManager:
         self.vector_store = Chroma(
             collection_name=COLLECTION_NAME,
             embedding_function=self.embeddings,
-            persist_directory=str(CHROMA_DIR)
+            persist_directory=str(CHROMA_DIR),
+            collection_metadata=HNSW_SETTINGS
         )
-    
-    def add_documents(self, documents: List[Document]) -> None:
+        self._tune_local_store()
+        self.embedding_cache = EmbeddingCache()
+
+    def _tune_local_store(self) -> None:
         """
-        Add documents to the vector store with improved error handling and retries.
+        Switch the local Chroma SQLite store to WAL journaling.
+
+        WAL mode is persistent in the database file, so setting it once here
+        benefits every later connection and cuts the fsync cost of each
+        insert transaction. (There is no remote connection to pool or keep
+        alive with the local persistent client.)
+        """
+        db_path = CHROMA_DIR / "chroma.sqlite3"
+        if not db_path.exists():
+            return
+        try:
+            conn = sqlite3.connect(str(db_path))
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not enable WAL on Chroma store: {str(e)}")
+
+    def _prepare_documents(self, documents: List[Document]) -> tuple:
+        """Filter complex metadata and return parallel (texts, metadatas) lists.
+
+        Metadata is rewritten in place rather than copied into fresh Document
+        objects, so ingestion does not double its object count just to join
+        list values.
         """
-        # Filter complex metadata from documents
-        filtered_documents = []
         for doc in documents:
             # Convert list values to comma-separated strings in metadata
-            filtered_metadata = {}
             for key, value in doc.metadata.items():
                 if isinstance(value, list):
-                    filtered_metadata[key] = ','.join(str(v) for v in value)
-                else:
-                    filtered_metadata[key] = value
-                    
-            # Create new document with filtered metadata
-            filtered_documents.append(
-                Document(
-                    page_content=doc.page_content,
-                    metadata=filtered_metadata
-                )
-            )
-        
-        # Add documents in smaller batches to avoid timeouts
-        batch_size = 5
-        total_batches = (len(filtered_documents) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(filtered_documents), batch_size):
-            batch = filtered_documents[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            max_retries = 3
-            retry_delay = 5
-            
+                    doc.metadata[key] = ','.join(str(v) for v in value)
+
+            # Precompute query-independent ranking signals so retrieval
+            # doesn't re-derive them for every candidate on every query
+            doc_type = doc.metadata.get('source', '')
+            if doc_type == 'support_ticket':
+                status = doc.metadata.get('status', '').lower()
+                doc_type = 'resolved_ticket' if status == 'resolved' else 'pending_ticket'
+                date_field = doc.metadata.get('resolved_date') or doc.metadata.get('created_date')
+            else:
+                date_field = doc.metadata.get('last_updated')
+
+            doc.metadata['_priority'] = DOC_TYPE_PRIORITIES.get(doc_type, 0) / _MAX_DOC_PRIORITY
+            if date_field:
+                try:
+                    doc.metadata['_doc_epoch'] = datetime.fromisoformat(date_field).timestamp()
+                except ValueError:
+                    pass
+
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        return texts, metadatas
+
+    async def _aembed_batch(self, batch_texts: List[str], batch_num: int, total_batches: int, semaphore: asyncio.Semaphore) -> List[List[float]]:
+        """Embed one batch of texts with retries; concurrency is bounded by the semaphore."""
+        max_retries = 3
+        retry_delay = 5
+
+        async with semaphore:
             for attempt in range(max_retries):
                 try:
-                    logger.info(f"Processing batch {batch_num}/{total_batches} (Documents {i+1}-{min(i+batch_size, len(filtered_documents))})")
-                    self.vector_store.add_documents(batch)
-                    break
+                    logger.info(f"Embedding batch {batch_num}/{total_batches}")
+                    return await self.embeddings.aembed_documents(batch_texts)
                 except Exception as e:
                     if attempt < max_retries - 1:
-                        logger.warning(f"Error processing batch {batch_num}, attempt {attempt + 1}/{max_retries}: {str(e)}")
+                        logger.warning(f"Error embedding batch {batch_num}, attempt {attempt + 1}/{max_retries}: {str(e)}")
                         logger.info(f"Retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
+                        await asyncio.sleep(retry_delay)
                         retry_delay *= 2  # Exponential backoff
                     else:
-                        logger.error(f"Failed to process batch {batch_num} after {max_retries} attempts")
+                        logger.error(f"Failed to embed batch {batch_num} after {max_retries} attempts")
                         raise
+
+    async def aadd_documents(self, documents: List[Document]) -> None:
+        """
+        Add documents to the vector store, overlapping embedding batches.
+
+        Embedding requests for all batches run concurrently (bounded by
+        EMBED_CONCURRENCY) so the network round trips overlap instead of
+        queueing behind each other; the vectors are then inserted into the
+        local Chroma collection batch by batch.
+        """
+        texts, metadatas = self._prepare_documents(documents)
+
+        # Unchanged chunks come straight from the on-disk cache; only the
+        # misses go to the embedding API
+        all_vectors = self.embedding_cache.get_many(texts)
+        miss_indices = [i for i, vector in enumerate(all_vectors) if vector is None]
+        if len(miss_indices) < len(texts):
+            logger.info(f"Embedding cache hit for {len(texts) - len(miss_indices)}/{len(texts)} chunks")
+
+        if miss_indices:
+            # Embed in length-sorted order so each batch holds similarly
+            # sized texts; padded batch cost is set by the longest member,
+            # and mixing short chunks in with long ones wastes that padding
+            miss_indices.sort(key=lambda i: len(texts[i]))
+            miss_texts = [texts[i] for i in miss_indices]
+
+            batch_starts = list(range(0, len(miss_texts), EMBED_BATCH_SIZE))
+            total_batches = len(batch_starts)
+            semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+            batch_vectors = await asyncio.gather(*(
+                self._aembed_batch(miss_texts[i:i + EMBED_BATCH_SIZE], batch_num, total_batches, semaphore)
+                for batch_num, i in enumerate(batch_starts, start=1)
+            ))
+
+            # Scatter the fresh vectors back to their original positions
+            # and persist them for the next run
+            miss_vectors = [v for vectors in batch_vectors for v in vectors]
+            for position, vector in zip(miss_indices, miss_vectors):
+                all_vectors[position] = vector
+            self.embedding_cache.put_many(miss_texts, miss_vectors)
+
+        # Insert in CHROMA_INSERT_BATCH slices, independent of the embedding
+        # batch size, so each insert amortizes its transaction overhead
+        for i in range(0, len(texts), CHROMA_INSERT_BATCH):
+            batch_texts = texts[i:i + CHROMA_INSERT_BATCH]
+            logger.info(f"Inserting documents {i+1}-{i+len(batch_texts)} of {len(texts)}")
+            self.vector_store._collection.add(
+                ids=[str(uuid4()) for _ in batch_texts],
+                embeddings=all_vectors[i:i + CHROMA_INSERT_BATCH],
+                documents=batch_texts,
+                metadatas=metadatas[i:i + CHROMA_INSERT_BATCH]
+            )
+
+    def add_documents(self, documents: List[Document]) -> None:
+        """
+        Add documents to the vector store with improved error handling and retries.
+        """
+        asyncio.run(self.aadd_documents(documents))
+
+    def add_documents_stream(self, documents, batch_size: int = EMBED_BATCH_SIZE) -> int:
+        """
+        Consume an iterator of documents, ingesting in fixed-size batches so
+        peak memory stays constant regardless of corpus size. The default
+        batch size matches EMBED_BATCH_SIZE, so each flush issues exactly one
+        batched embedding request. Returns the number of documents ingested.
+        """
+        total = 0
+        buffer = []
+        for doc in documents:
+            buffer.append(doc)
+            if len(buffer) >= batch_size:
+                self.add_documents(buffer)
+                total += len(buffer)
+                buffer = []
+        if buffer:
+            self.add_documents(buffer)
+            total += len(buffer)
+        return total
     
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a single query string with the usual retry behavior.
+        """
+        max_retries = 3
+        retry_delay = 5
+
+        for attempt in range(max_retries):
+            try:
+                return self.embeddings.embed_query(query)
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    logger.warning(f"Query embedding failed, attempt {attempt + 1}/{max_retries}: {str(e)}")
+                    logger.info(f"Retrying in {retry_delay} seconds...")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2
+                else:
+                    logger.error("Query embedding failed after all retry attempts")
+                    raise
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter_dict: dict = None) -> List[tuple]:
+        """
+        Search with a precomputed query vector, returning (document,
+        relevance score) pairs with higher meaning more similar.
+
+        Despite its name, the underlying Chroma call returns raw distances
+        (lower is more similar), so they are converted here with the
+        store's relevance function — 1 - distance for the configured
+        cosine space — before callers rank on them.
+        """
+        relevance_fn = self.vector_store._select_relevance_score_fn()
+        results = self.vector_store.similarity_search_by_vector_with_relevance_scores(
+            embedding,
+            k=k,
+            filter=filter_dict
+        )
+        return [(doc, relevance_fn(distance)) for doc, distance in results]
+
     def similarity_search(self, query: str, k: int = 4, filter_dict: dict = None) -> List[Document]:
         """
         Search for similar documents with improved error handling.
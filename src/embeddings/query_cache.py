@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from config.retrieval_config import QUERY_CACHE_SETTINGS
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# LSH prefilter shape: each cached embedding is hashed into _NUM_HASHES
+# 8-bit sign codes; only entries sharing at least one code with the query
+# are scored exactly. At the 0.95 similarity threshold two matching
+# queries agree on one sign bit with p ≈ 0.90, so a single 8-bit code
+# collides with p ≈ 0.43 and eight OR-ed codes keep ≈ 99% of true hits
+# (4x16-bit codes only kept ≈ 55%). Small caches skip the prefilter —
+# the exact pass over a few hundred rows is already sub-millisecond.
+_NUM_HASHES = 8
+_HASH_BITS = 8
+_BIT_POWERS = 1 << np.arange(_HASH_BITS, dtype=np.uint32)
+_PREFILTER_MIN_ENTRIES = 512
+
+class SemanticQueryCache:
+    """
+    Cache of answers keyed by query embedding rather than exact query text.
+
+    Paraphrased queries land close together in embedding space, so a
+    cosine-similarity lookup over L2-normalized embeddings lets near-
+    duplicate queries reuse an earlier answer and skip retrieval and LLM
+    generation entirely. Entries expire after a TTL and the cache is
+    capped at a fixed number of queries.
+    """
+
+    def __init__(self, settings: dict = QUERY_CACHE_SETTINGS):
+        self._threshold = settings['similarity_threshold']
+        self._ttl = settings['ttl']
+        self._max_entries = settings['max_entries']
+        # Cached embeddings as rows of a single matrix, so a lookup is one
+        # matrix-vector product over all entries
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._entries: List[Tuple[Any, Optional[str], datetime]] = []
+        # Random-projection hashes kept row-parallel with the embeddings;
+        # projections are created lazily once the embedding dimension is known
+        self._codes = np.empty((0, _NUM_HASHES), dtype=np.uint8)
+        self._projections: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _hash(self, vector: np.ndarray) -> np.ndarray:
+        """Hash a normalized vector into _NUM_HASHES 8-bit sign codes."""
+        if self._projections is None:
+            rng = np.random.default_rng(0)
+            self._projections = rng.standard_normal(
+                (vector.shape[0], _NUM_HASHES * _HASH_BITS)
+            ).astype(np.float32)
+        bits = (vector @ self._projections) > 0
+        return (bits.reshape(_NUM_HASHES, _HASH_BITS) * _BIT_POWERS).sum(axis=1).astype(np.uint8)
+
+    def _evict_expired(self) -> None:
+        now = datetime.now()
+        keep = [i for i, (_, _, stamp) in enumerate(self._entries) if now - stamp <= self._ttl]
+        if len(keep) < len(self._entries):
+            self._entries = [self._entries[i] for i in keep]
+            self._embeddings = self._embeddings[keep]
+            self._codes = self._codes[keep]
+
+    def get(self, query_embedding: List[float], version: Optional[str] = None) -> Optional[Any]:
+        """
+        Return the cached value for the closest stored query if it clears
+        the similarity threshold and was cached for the same user version.
+        """
+        self._evict_expired()
+        if not self._entries:
+            return None
+
+        # Only entries cached for the same user version are candidate
+        # answers; filtering before the argmax keeps a slightly closer
+        # other-version entry from masking a valid hit
+        vector = self._normalize(query_embedding)
+        mask = np.fromiter(
+            (cached_version == version for _, cached_version, _ in self._entries),
+            dtype=bool,
+            count=len(self._entries)
+        )
+        # LSH prefilter: exact cosine only runs on entries that collide
+        # with the query in at least one hash, keeping lookups cheap as
+        # the cache grows; small caches score every row exactly instead
+        if len(self._entries) >= _PREFILTER_MIN_ENTRIES:
+            mask &= (self._codes == self._hash(vector)).any(axis=1)
+        candidates = np.nonzero(mask)[0]
+        if candidates.size == 0:
+            return None
+
+        similarities = self._embeddings[candidates] @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self._threshold:
+            return self._entries[candidates[best]][0]
+        return None
+
+    def put(self, query_embedding: List[float], value: Any, version: Optional[str] = None) -> None:
+        """
+        Cache the value produced for a query embedding.
+        """
+        vector = self._normalize(query_embedding)
+        row = vector[np.newaxis, :]
+        if self._embeddings.size == 0:
+            self._embeddings = row
+        else:
+            self._embeddings = np.vstack((self._embeddings, row))
+        self._codes = np.vstack((self._codes, self._hash(vector)[np.newaxis, :]))
+        self._entries.append((value, version, datetime.now()))
+
+        if len(self._entries) > self._max_entries:
+            # Drop the oldest entry; insertion order doubles as age order
+            self._entries.pop(0)
+            self._embeddings = self._embeddings[1:]
+            self._codes = self._codes[1:]
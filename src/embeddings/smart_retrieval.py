@@ -1,7 +1,8 @@
 import re
 from datetime import datetime
-from typing import List, Dict, Any, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from rank_bm25 import BM25Okapi
 from langchain_core.documents import Document
 from .embedding_manager import EmbeddingManager
 from config.retrieval_config import (
@@ -15,59 +16,103 @@ from config.retrieval_config import (
     FINAL_RESULTS_K
 )
 
-@dataclass
-class SearchResult:
-    document: Document
-    semantic_score: float
-    keyword_score: float
-    doc_priority: float
-    recency_score: float
-    final_score: float = 0.0
+# Component weights as a vector, in the column order used by search():
+# semantic, keyword, priority, recency
+_WEIGHT_VECTOR = np.array([
+    RELEVANCE_WEIGHTS['semantic_score'],
+    RELEVANCE_WEIGHTS['keyword_score'],
+    RELEVANCE_WEIGHTS['doc_priority'],
+    RELEVANCE_WEIGHTS['recency']
+], dtype=np.float32)
 
 class SmartRetrieval:
     def __init__(self, embedding_manager: EmbeddingManager):
         self.embedding_manager = embedding_manager
-        
+        # Compile the query/negation patterns once; per-query re.search calls
+        # would otherwise re-enter the re compile cache on every request
+        self._category_patterns = {
+            category: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for category, patterns in QUERY_PATTERNS.items()
+        }
+        self._negation_patterns = [
+            re.compile(rf'\b{pattern}\b', re.IGNORECASE) for pattern in NEGATION_PATTERNS
+        ]
+        # Optional BM25 keyword index over the chunk corpus; built lazily
+        # via build_keyword_index, with the n-gram scorer as fallback
+        self.bm25: Optional[BM25Okapi] = None
+        self._bm25_rows: Dict[Tuple[Any, Any], int] = {}
+
+    @staticmethod
+    def _chunk_key(document: Document) -> Tuple[Any, Any]:
+        """Stable identity of a chunk across index build and retrieval."""
+        return (document.metadata.get('id'), document.metadata.get('chunk_id'))
+
+    def build_keyword_index(self, documents: List[Document]) -> None:
+        """Build a BM25 index over the chunk corpus.
+
+        One vectorized get_scores call per query then replaces the per-doc
+        n-gram intersection loops.
+        """
+        self.bm25 = BM25Okapi([doc.page_content.lower().split() for doc in documents])
+        self._bm25_rows = {self._chunk_key(doc): i for i, doc in enumerate(documents)}
+
     def _classify_query(self, query: str) -> List[str]:
         """Classify query into predefined categories."""
         categories = []
-        for category, patterns in QUERY_PATTERNS.items():
+        for category, patterns in self._category_patterns.items():
             for pattern in patterns:
-                if re.search(pattern, query, re.IGNORECASE):
+                if pattern.search(query):
                     categories.append(category)
                     break
         return list(set(categories))
-    
+
     def _has_negation(self, query: str) -> bool:
         """Check if query contains negation."""
-        for pattern in NEGATION_PATTERNS:
-            if re.search(fr'\b{pattern}\b', query, re.IGNORECASE):
+        for pattern in self._negation_patterns:
+            if pattern.search(query):
                 return True
         return False
     
-    def _calculate_keyword_score(self, query: str, document: Document) -> float:
-        """Calculate keyword matching score using n-grams."""
-        query_terms = query.lower().split()
-        doc_text = document.page_content.lower()
-        
-        # Generate n-grams from query
-        ngrams = []
+    @staticmethod
+    def _build_ngrams(terms: List[str]) -> set:
+        """Build the configured range of n-grams from a token list."""
+        ngrams = set()
         for n in range(KEYWORD_SETTINGS['min_ngram'], KEYWORD_SETTINGS['max_ngram'] + 1):
-            for i in range(len(query_terms) - n + 1):
-                ngrams.append(' '.join(query_terms[i:i+n]))
-        
-        # Calculate matches
-        matches = 0
-        total_ngrams = len(ngrams)
-        
-        for ngram in ngrams:
-            if ngram in doc_text:
-                matches += 1
-        
-        return matches / total_ngrams if total_ngrams > 0 else 0.0
+            for i in range(len(terms) - n + 1):
+                ngrams.add(' '.join(terms[i:i+n]))
+        return ngrams
+
+    def _calculate_keyword_score(self, query: str, document: Document) -> float:
+        """Calculate keyword matching score via n-gram set intersection.
+
+        Tokenizing both sides once and intersecting hashed n-gram sets is
+        O(doc length) per document, instead of one full substring scan of the
+        document per query n-gram.
+        """
+        query_ngrams = self._build_ngrams(query.lower().split())
+        if not query_ngrams:
+            return 0.0
+
+        # The lowercased text and its n-gram set are query-independent, so
+        # cache them on the document after the first scoring
+        doc_ngrams = document.metadata.get('_ngrams')
+        if doc_ngrams is None:
+            lower = document.metadata.get('_lower')
+            if lower is None:
+                lower = document.page_content.lower()
+                document.metadata['_lower'] = lower
+            doc_ngrams = self._build_ngrams(lower.split())
+            document.metadata['_ngrams'] = doc_ngrams
+
+        return len(query_ngrams & doc_ngrams) / len(query_ngrams)
     
     def _calculate_doc_priority(self, document: Document) -> float:
         """Calculate document priority score based on type."""
+        # Prefer the value precomputed at ingestion time
+        priority = document.metadata.get('_priority')
+        if priority is not None:
+            return priority
+
         doc_type = document.metadata.get('source', '')
         if doc_type == 'support_ticket':
             status = document.metadata.get('status', '').lower()
@@ -77,20 +122,38 @@ class SmartRetrieval:
         max_priority = max(DOC_TYPE_PRIORITIES.values())
         return priority / max_priority
     
-    def _calculate_recency_score(self, document: Document) -> float:
-        """Calculate recency score based on document age."""
-        date_field = None
-        if document.metadata.get('source') == 'support_ticket':
-            date_field = document.metadata.get('resolved_date') or document.metadata.get('created_date')
-        else:
-            date_field = document.metadata.get('last_updated')
-            
-        if not date_field:
-            return 0.0
-            
-        doc_date = datetime.fromisoformat(date_field)
-        age = datetime.now() - doc_date
-        
+    def _calculate_recency_score(self, document: Document, now: datetime) -> float:
+        """Calculate recency score based on document age.
+
+        `now` is computed once per search; the parsed document date is cached
+        on the metadata so repeated scoring skips the ISO parse.
+        """
+        doc_date = document.metadata.get('_parsed_date')
+        if doc_date is None:
+            # Prefer the epoch precomputed at ingestion time
+            doc_epoch = document.metadata.get('_doc_epoch')
+            if doc_epoch is not None:
+                doc_date = datetime.fromtimestamp(doc_epoch)
+                document.metadata['_parsed_date'] = doc_date
+                return self._recency_from_age(now - doc_date)
+
+            date_field = None
+            if document.metadata.get('source') == 'support_ticket':
+                date_field = document.metadata.get('resolved_date') or document.metadata.get('created_date')
+            else:
+                date_field = document.metadata.get('last_updated')
+
+            if not date_field:
+                return 0.0
+
+            doc_date = datetime.fromisoformat(date_field)
+            document.metadata['_parsed_date'] = doc_date
+
+        return self._recency_from_age(now - doc_date)
+
+    @staticmethod
+    def _recency_from_age(age) -> float:
+        """Map a document age to its recency score."""
         if age <= RECENCY_SETTINGS['recent_threshold']:
             return 1.0
         elif age >= RECENCY_SETTINGS['max_age']:
@@ -101,15 +164,6 @@ class SmartRetrieval:
             doc_age = (age - RECENCY_SETTINGS['recent_threshold']).days
             return 1.0 - (doc_age / age_range)
     
-    def _calculate_final_score(self, result: SearchResult) -> float:
-        """Calculate final score using weighted components."""
-        return (
-            result.semantic_score * RELEVANCE_WEIGHTS['semantic_score'] +
-            result.keyword_score * RELEVANCE_WEIGHTS['keyword_score'] +
-            result.doc_priority * RELEVANCE_WEIGHTS['doc_priority'] +
-            result.recency_score * RELEVANCE_WEIGHTS['recency']
-        )
-    
     def _filter_by_version(self, documents: List[Document], version: str = None) -> List[Document]:
         """Filter documents by version if specified."""
         if not version:
@@ -145,57 +199,75 @@ class SmartRetrieval:
         self,
         query: str,
         version: str = None,
-        k: int = FINAL_RESULTS_K
+        k: int = FINAL_RESULTS_K,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Tuple[Document, float]]:
         """
         Perform smart retrieval combining semantic search, keyword matching,
         and advanced ranking features.
+
+        Callers that already embedded the query (e.g. for a cache lookup)
+        can pass the vector in to avoid embedding it twice.
         """
-        # Get initial results from semantic search
-        initial_results = self.embedding_manager.similarity_search(
-            query,
+        # Embed the query once and search by vector; the manager converts
+        # Chroma's raw distances to higher-is-better relevance scores
+        if query_embedding is None:
+            query_embedding = self.embedding_manager.embed_query(query)
+        scored_results = self.embedding_manager.similarity_search_by_vector(
+            query_embedding,
             k=RERANK_TOP_K
         )
-        
+        semantic_scores = {id(doc): score for doc, score in scored_results}
+        initial_results = [doc for doc, _ in scored_results]
+
         # Filter by version if specified
         initial_results = self._filter_by_version(initial_results, version)
         
         # Boost similar support cases
         initial_results = self._boost_similar_cases(query, initial_results)
         
-        # Calculate scores for each result
-        search_results = []
+        if not initial_results:
+            return []
+
+        # Collect component scores into a (K, 4) matrix
         has_negation = self._has_negation(query)
-        
-        for doc in initial_results:
-            # Base semantic score (normalized to 0-1)
-            semantic_score = 1.0 - (initial_results.index(doc) / len(initial_results))
-            
+        now = datetime.now()
+        scores = np.empty((len(initial_results), 4), dtype=np.float32)
+
+        # One vectorized BM25 pass covers all candidates when the index exists
+        bm25_scores = None
+        if self.bm25 is not None:
+            raw_scores = self.bm25.get_scores(query.lower().split())
+            max_score = raw_scores.max() if len(raw_scores) else 0.0
+            bm25_scores = raw_scores / max_score if max_score > 0 else raw_scores
+
+        for rank, doc in enumerate(initial_results):
+            # Real semantic relevance score, clamped to 0-1
+            semantic_score = min(max(semantic_scores[id(doc)], 0.0), 1.0)
+
             # Calculate other scores
-            keyword_score = self._calculate_keyword_score(query, doc)
+            keyword_score = None
+            if bm25_scores is not None:
+                row = self._bm25_rows.get(self._chunk_key(doc))
+                if row is not None:
+                    keyword_score = float(bm25_scores[row])
+            if keyword_score is None:
+                keyword_score = self._calculate_keyword_score(query, doc)
             doc_priority = self._calculate_doc_priority(doc)
-            recency_score = self._calculate_recency_score(doc)
-            
+            recency_score = self._calculate_recency_score(doc, now)
+
             # Handle negation by inverting semantic and keyword scores
             if has_negation:
                 semantic_score = 1.0 - semantic_score
                 keyword_score = 1.0 - keyword_score
-            
+
             # Apply any boosts from similar case matching
             boost = doc.metadata.pop('_score_boost', 1.0)
-            
-            result = SearchResult(
-                document=doc,
-                semantic_score=semantic_score * boost,
-                keyword_score=keyword_score * boost,
-                doc_priority=doc_priority,
-                recency_score=recency_score
-            )
-            
-            # Calculate final score
-            result.final_score = self._calculate_final_score(result)
-            search_results.append(result)
-        
-        # Sort by final score and return top k
-        search_results.sort(key=lambda x: x.final_score, reverse=True)
-        return [(result.document, result.final_score) for result in search_results[:k]] 
\ No newline at end of file
+
+            scores[rank] = (semantic_score * boost, keyword_score * boost, doc_priority, recency_score)
+
+        # One matrix-vector product computes every final score, and argsort
+        # replaces the Python-level sort
+        final_scores = scores @ _WEIGHT_VECTOR
+        order = np.argsort(-final_scores)[:k]
+        return [(initial_results[i], float(final_scores[i])) for i in order] 
\ No newline at end of file
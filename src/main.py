@@ -1,9 +1,12 @@
+import asyncio
 import logging
 from pathlib import Path
+from config.config import EMBED_BATCH_SIZE
 from data_processing.document_loader import CloudSyncDocumentLoader
 from data_processing.intelligent_splitter import IntelligentSplitter
 from embeddings.embedding_manager import EmbeddingManager
 from embeddings.smart_retrieval import SmartRetrieval
+from embeddings.query_cache import SemanticQueryCache
 from answer_generation import AnswerGenerator, AnswerFormatter
 
 # Set up logging
@@ -13,6 +16,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Test queries handled at once; each waits on embedding + LLM round trips,
+# so overlapping them brings wallclock close to the slowest case
+TEST_CONCURRENCY = 4
+
+# Bounded queue sizes between the ingest pipeline stages; full queues make
+# faster stages wait instead of buffering the whole corpus
+SPLIT_QUEUE_SIZE = 256
+EMBED_QUEUE_SIZE = 1024
+
+async def ingest_documents(document_loader: CloudSyncDocumentLoader,
+                           splitter: IntelligentSplitter,
+                           embedding_manager: EmbeddingManager,
+                           chunks: list) -> int:
+    """
+    Run load -> split -> embed as a three-stage pipeline over bounded
+    queues, so IO-bound loading, CPU-bound splitting and network-bound
+    embedding overlap instead of running back to back. Chunks are also
+    appended to `chunks` for the keyword index. Returns the chunk count.
+    """
+    split_queue = asyncio.Queue(maxsize=SPLIT_QUEUE_SIZE)
+    embed_queue = asyncio.Queue(maxsize=EMBED_QUEUE_SIZE)
+
+    async def load_worker():
+        documents = await document_loader.aload_all_documents()
+        logger.info(f"Loaded {len(documents)} documents")
+        for doc in documents:
+            await split_queue.put(doc)
+        await split_queue.put(None)  # end-of-stream sentinel
+
+    async def split_worker():
+        while (doc := await split_queue.get()) is not None:
+            for chunk in await asyncio.to_thread(splitter.split_documents, [doc]):
+                await embed_queue.put(chunk)
+        await embed_queue.put(None)
+
+    async def embed_worker():
+        total = 0
+        batch = []
+        while (chunk := await embed_queue.get()) is not None:
+            chunks.append(chunk)
+            batch.append(chunk)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                await embedding_manager.aadd_documents(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            await embedding_manager.aadd_documents(batch)
+            total += len(batch)
+        return total
+
+    results = await asyncio.gather(load_worker(), split_worker(), embed_worker())
+    return results[2]
+
 def test_smart_retrieval(retrieval: SmartRetrieval, answer_gen: AnswerGenerator, formatter: AnswerFormatter):
     """Test the smart retrieval system with various queries."""
     test_cases = [
@@ -49,52 +105,94 @@ def test_smart_retrieval(retrieval: SmartRetrieval, answer_gen: AnswerGenerator,
         }
     ]
     
+    query_cache = SemanticQueryCache()
+    semaphore = asyncio.Semaphore(TEST_CONCURRENCY)
+
+    async def run_case(test_case):
+        query = test_case["query"]
+        user_version = test_case["user_version"]
+
+        async with semaphore:
+            # Near-duplicate queries reuse the cached answer instead of
+            # re-running retrieval and generation
+            query_embedding = await asyncio.to_thread(
+                retrieval.embedding_manager.embed_query, query
+            )
+            formatted_answer = query_cache.get(query_embedding, version=user_version)
+            if formatted_answer is None:
+                # Get relevant documents
+                retrieved_docs = await asyncio.to_thread(
+                    retrieval.search, query, query_embedding=query_embedding
+                )
+
+                # Generate and format answer
+                generated_answer = await asyncio.to_thread(
+                    answer_gen.generate_answer, query, retrieved_docs, user_version
+                )
+                formatted_answer = formatter.format_answer(generated_answer)
+                query_cache.put(query_embedding, formatted_answer, version=user_version)
+            else:
+                logger.info(f"Answer served from semantic query cache: {query}")
+
+        return formatted_answer
+
+    def case_key(test_case):
+        # Whitespace/case-normalized query plus user version; cases that
+        # agree on both would produce identical answers
+        return ' '.join(test_case["query"].lower().split()), test_case["user_version"]
+
+    # Run each distinct query once and fan the answer back out to every
+    # test case that asked it
+    unique_cases = {}
+    for test_case in test_cases:
+        unique_cases.setdefault(case_key(test_case), test_case)
+
+    async def run_all():
+        # Queries run concurrently, bounded by the semaphore
+        answers = await asyncio.gather(
+            *(run_case(test_case) for test_case in unique_cases.values())
+        )
+        return dict(zip(unique_cases, answers))
+
     logger.info("Testing smart retrieval and answer generation system...")
+    answers = asyncio.run(run_all())
     for test_case in test_cases:
         query = test_case["query"]
         user_version = test_case["user_version"]
-        
         logger.info(f"\nQuery from human: {query}")
         if user_version:
             logger.info(f"User Version: {user_version}")
-        
-        # Get relevant documents
-        retrieved_docs = retrieval.search(query)
-        
-        # Generate and format answer
-        generated_answer = answer_gen.generate_answer(query, retrieved_docs, user_version)
-        formatted_answer = formatter.format_answer(generated_answer)
-        
         logger.info("Generated Answer:")
-        logger.info(formatted_answer)
+        logger.info(answers[case_key(test_case)])
         logger.info("-" * 80)
 
 def main():
     try:
         logger.info("Starting document processing pipeline")
-        
-        # 1. Load documents
-        logger.info("Loading documents")
+
+        # 1. Initialize the loader, splitter and embedding manager
+        logger.info("Initializing loader, intelligent chunking and embedding manager")
         document_loader = CloudSyncDocumentLoader()
-        documents = document_loader.load_all_documents()
-        logger.info(f"Loaded {len(documents)} documents")
-        
-        # 2. Split documents
-        logger.info("Splitting documents with intelligent chunking")
         splitter = IntelligentSplitter()
-        split_documents = splitter.split_documents(documents)
-        logger.info(f"Created {len(split_documents)} chunks")
-        
-        # 3. Initialize embedding manager and add documents
-        logger.info("Initializing embedding manager")
         embedding_manager = EmbeddingManager()
-        
-        logger.info("Adding documents to vector store")
-        embedding_manager.add_documents(split_documents)
-        
+
+        # 2-3. Load, split and embed as one pipeline
+        logger.info("Running load/split/embed ingest pipeline")
+        chunks = []  # collected on the side for the keyword index
+        total_chunks = asyncio.run(
+            ingest_documents(document_loader, splitter, embedding_manager, chunks)
+        )
+        logger.info(f"Indexed {total_chunks} chunks")
+
         # 4. Initialize smart retrieval
         logger.info("Initializing smart retrieval system")
         smart_retrieval = SmartRetrieval(embedding_manager)
+        smart_retrieval.build_keyword_index(chunks)
+
+        # One throwaway query pays the cold-path costs (embedding client
+        # setup, Chroma index load) before any real query is served
+        logger.info("Warming up retrieval path")
+        smart_retrieval.search("warmup")
         
         # 5. Initialize answer generation components
         logger.info("Initializing answer generation system")
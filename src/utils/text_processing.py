@@ -1,99 +1,305 @@
-import re
-from typing import List, Dict, Any
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
 
-def extract_numbered_lists(text: str) -> List[Dict[str, Any]]:
+@dataclass(slots=True)
+class Region:
+    """A span of source text to treat as one unit, with half-open offsets.
+
+    Only offsets and a reference to the source are stored; content is
+    sliced and stripped on demand, so regions that are merely merged or
+    measured never materialize their text.
+    """
+    start: int
+    end: int
+    type: str
+    source: str = field(default='', repr=False)
+
+    @property
+    def content(self) -> str:
+        return self.source[self.start:self.end].strip()
+
+# Ordinal words that open a step line ("First, ..." etc.)
+_STEP_WORDS = ('First', 'Second', 'Third', 'Finally')
+
+def _has_tail(line: str, i: int) -> bool:
+    """True if position i starts whitespace with at least one more character
+    after it — the scanner equivalent of the old regex tail ``\\s+.+``."""
+    return i < len(line) - 1 and line[i].isspace()
+
+def _classify_line(line: str) -> Tuple[bool, bool, bool]:
+    """
+    Classify one newline-free line with plain string tests.
+    Returns (is_numbered_item, is_step_item, is_blank).
+    """
+    n = len(line)
+    i = 0
+    while i < n and line[i].isspace():
+        i += 1
+    if i == n:
+        return False, False, True
+
+    numbered = False
+    step = False
+    c = line[i]
+
+    if c.isdigit():
+        # "1." / "1)" items; a "1." item whose text is a lone capital
+        # letter ("1. A ...") also counts as a step, like the old
+        # \d+\.\s+[A-Z]\s+ pattern
+        j = i + 1
+        while j < n and line[j].isdigit():
+            j += 1
+        if j < n and line[j] in '.)' and _has_tail(line, j + 1):
+            numbered = True
+            if line[j] == '.':
+                k = j + 1
+                while k < n and line[k].isspace():
+                    k += 1
+                if k > j + 1 and k < n and 'A' <= line[k] <= 'Z' and _has_tail(line, k + 1):
+                    step = True
+    elif c == '(':
+        # "(1)" items
+        j = i + 1
+        while j < n and line[j].isdigit():
+            j += 1
+        if j > i + 1 and j < n and line[j] == ')' and _has_tail(line, j + 1):
+            numbered = True
+    elif line.startswith('Step ', i):
+        # "Step 1:" / "Step 2." / "Step 3)"
+        j = i + 5
+        k = j
+        while k < n and line[k].isdigit():
+            k += 1
+        if k > j and k < n and line[k] in ':.)' and _has_tail(line, k + 1):
+            step = True
+    else:
+        for word in _STEP_WORDS:
+            if line.startswith(word, i):
+                j = i + len(word)
+                if j < n and line[j] == ',':
+                    j += 1
+                if _has_tail(line, j):
+                    step = True
+                break
+
+    return numbered, step, False
+
+def _scan_line_regions(text: str) -> Dict[str, List[List[int]]]:
+    """
+    Single pass over the lines of text, collecting contiguous runs of
+    numbered-list items and step items as [start, end) offset pairs.
+    Whitespace-only lines between matching lines are absorbed into the
+    surrounding run, matching the old regex behavior.
+    """
+    regions: Dict[str, List[List[int]]] = {'numbered_list': [], 'steps': []}
+    runs: Dict[str, Optional[List[int]]] = {'numbered_list': None, 'steps': None}
+    blank_start = None
+    offset = 0
+
+    for line in text.splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        numbered, step, blank = _classify_line(line.rstrip('\r\n'))
+
+        if blank:
+            # Hold position; a following matching line absorbs the blanks,
+            # a non-matching one closes the run at its last item
+            if blank_start is None:
+                blank_start = line_start
+            continue
+
+        for kind, matched in (('numbered_list', numbered), ('steps', step)):
+            run = runs[kind]
+            if matched:
+                if run is None:
+                    runs[kind] = [blank_start if blank_start is not None else line_start, offset]
+                else:
+                    run[1] = offset
+            elif run is not None:
+                regions[kind].append(run)
+                runs[kind] = None
+        blank_start = None
+
+    for kind, run in runs.items():
+        if run is not None:
+            regions[kind].append(run)
+
+    return regions
+
+def extract_numbered_lists(text: str) -> List[Region]:
     """
     Extract numbered lists and their context from text.
-    Returns list of dicts with start/end positions and content.
+    Returns list of regions with start/end positions and content.
     """
-    # Match patterns like "1.", "1)", "(1)", etc.
-    numbered_patterns = [
-        r'\d+\.',  # 1.
-        r'\d+\)',  # 1)
-        r'\(\d+\)',  # (1)
+    return [
+        Region(start, end, 'numbered_list', text)
+        for start, end in _scan_line_regions(text)['numbered_list']
     ]
-    
-    lists = []
-    for pattern in numbered_patterns:
-        # Find all sequences of numbered items
-        matches = list(re.finditer(fr'(?m)^(?:\s*{pattern}\s+.+\n?)+', text, re.MULTILINE))
-        for match in matches:
-            lists.append({
-                'start': match.start(),
-                'end': match.end(),
-                'content': match.group(),
-                'type': 'numbered_list'
-            })
-    
-    return sorted(lists, key=lambda x: x['start'])
-
-def identify_section_boundaries(text: str) -> List[Dict[str, Any]]:
+
+def extract_numbered_lists_bytes(buf) -> List[Region]:
+    """
+    Byte-level variant of extract_numbered_lists for very large inputs.
+
+    Accepts any object with bytes-like find and slicing (bytes, mmap), so
+    multi-megabyte files can be scanned straight from a memory map without
+    a full unicode copy. Line boundaries come from buf.find(b'\\n'), which
+    uses memchr under CPython, and only the current line is decoded
+    (latin-1, byte-for-byte) for classification. Returned regions carry
+    byte offsets and no source text; slice buf yourself if the content is
+    needed.
+    """
+    regions = []
+    run_start = None
+    run_end = None
+    blank_start = None
+    pos = 0
+    n = len(buf)
+
+    while pos < n:
+        newline = buf.find(b'\n', pos)
+        line_end = n if newline < 0 else newline + 1
+        line = bytes(buf[pos:line_end]).decode('latin-1').rstrip('\r\n')
+        numbered, _, blank = _classify_line(line)
+
+        if blank:
+            if blank_start is None:
+                blank_start = pos
+        else:
+            if numbered:
+                if run_start is None:
+                    run_start = blank_start if blank_start is not None else pos
+                run_end = line_end
+            elif run_start is not None:
+                regions.append(Region(run_start, run_end, 'numbered_list'))
+                run_start = None
+            blank_start = None
+        pos = line_end
+
+    if run_start is not None:
+        regions.append(Region(run_start, run_end, 'numbered_list'))
+
+    return regions
+
+def _iter_heading_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) spans of markdown '**Title**:' headings using
+    str.find instead of the regex engine; the title must close with
+    '**:' on the same line.
+    """
+    i = 0
+    n = len(text)
+    while True:
+        a = text.find('**', i)
+        if a < 0:
+            return
+        line_end = text.find('\n', a + 2)
+        if line_end < 0:
+            line_end = n
+        b = text.find('**', a + 2, line_end)
+        while b >= 0 and text[b + 2:b + 3] != ':':
+            b = text.find('**', b + 1, line_end)
+        if b >= 0:
+            yield a, b + 3
+            i = b + 3
+        else:
+            i = a + 1
+
+def identify_section_boundaries(text: str) -> List[Region]:
     """
     Identify logical section boundaries in text.
-    Returns list of dicts with start/end positions and section type.
+    Returns list of regions with start/end positions and section type.
     """
     sections = []
-    
-    # Find headings (indicated by **Title** in markdown)
-    heading_matches = list(re.finditer(r'\*\*(.*?)\*\*:', text))
-    for i, match in enumerate(heading_matches):
-        start = match.start()
-        end = heading_matches[i + 1].start() if i < len(heading_matches) - 1 else len(text)
-        sections.append({
-            'start': start,
-            'end': end,
-            'content': text[start:end].strip(),
-            'type': 'section'
-        })
-    
+
+    # Find headings (indicated by **Title** in markdown); each heading
+    # closes the previous section, so one buffered start suffices and the
+    # spans never pile up in an intermediate list
+    prev_start = None
+    for start, _ in _iter_heading_spans(text):
+        if prev_start is not None:
+            sections.append(Region(prev_start, start, 'section', text))
+        prev_start = start
+    if prev_start is not None:
+        sections.append(Region(prev_start, len(text), 'section', text))
+
     return sections
 
-def find_step_sequences(text: str) -> List[Dict[str, Any]]:
+def find_step_sequences(text: str) -> List[Region]:
     """
     Identify step-by-step sequences in text.
-    Returns list of dicts with start/end positions and steps content.
+    Returns list of regions with start/end positions and steps content.
     """
-    # Match common step indicators
-    step_patterns = [
-        r'Step \d+[:.)]',  # Step 1:, Step 2., Step 3)
-        r'First,?|Second,?|Third,?|Finally,?',  # First, Second, etc.
-        r'\d+\.\s+[A-Z]'  # 1. Start with...
+    return [
+        Region(start, end, 'steps', text)
+        for start, end in _scan_line_regions(text)['steps']
     ]
-    
-    steps = []
-    for pattern in step_patterns:
-        matches = list(re.finditer(fr'(?m)^(?:\s*{pattern}\s+.+\n?)+', text, re.MULTILINE))
-        for match in matches:
-            steps.append({
-                'start': match.start(),
-                'end': match.end(),
-                'content': match.group(),
-                'type': 'steps'
-            })
-    
-    return sorted(steps, key=lambda x: x['start'])
-
-def merge_overlapping_regions(regions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+def scan_preserve_regions(text: str) -> List[Region]:
+    """
+    Identify all regions to preserve (numbered lists, step sequences and
+    sections) in one pass over the text, merged and sorted by position.
+    """
+    line_regions = _scan_line_regions(text)
+
+    # Headings inside a list or step run belong to that run, not to a new
+    # section, so only free-standing heading positions count
+    covered = sorted(spans for spans in (line_regions['numbered_list'] + line_regions['steps']))
+    section_starts = []
+    for position, _ in _iter_heading_spans(text):
+        if not any(start <= position < end for start, end in covered):
+            section_starts.append(position)
+
+    sections = []
+    for i, start in enumerate(section_starts):
+        end = section_starts[i + 1] if i + 1 < len(section_starts) else len(text)
+        sections.append(Region(start, end, 'section', text))
+
+    # Each stream is already in start order, so a linear k-way merge
+    # replaces sorting the combined list
+    regions = list(heapq.merge(
+        (Region(start, end, 'numbered_list', text)
+         for start, end in line_regions['numbered_list']),
+        (Region(start, end, 'steps', text)
+         for start, end in line_regions['steps']),
+        sections,
+        key=lambda region: region.start
+    ))
+
+    return merge_overlapping_regions(regions, text)
+
+def merge_overlapping_regions(regions: List[Region], source_text: str) -> List[Region]:
     """
     Merge overlapping text regions to prevent splitting related content.
+
+    The sweep works on (start, end) spans only; merged regions carry the
+    source reference and slice their content lazily. Input that is
+    already sorted by start skips the sort.
     """
     if not regions:
         return []
-    
-    # Sort regions by start position
-    sorted_regions = sorted(regions, key=lambda x: x['start'])
-    merged = [sorted_regions[0]]
-    
-    for current in sorted_regions[1:]:
-        previous = merged[-1]
-        
-        # If current region overlaps with previous
-        if current['start'] <= previous['end']:
-            # Extend previous region if current ends later
-            if current['end'] > previous['end']:
-                previous['end'] = current['end']
-                previous['content'] = previous['content'] + current['content']
+
+    starts = [region.start for region in regions]
+    if any(a > b for a, b in zip(starts, starts[1:])):
+        regions = sorted(regions, key=lambda x: x.start)
+
+    # Sweep once over the spans; a group that absorbed more than one
+    # region becomes type 'merged'
+    spans = []
+    start, end, kind = regions[0].start, regions[0].end, regions[0].type
+    absorbed = False
+    for current in regions[1:]:
+        if current.start <= end:
+            if current.end > end:
+                end = current.end
+            absorbed = True
         else:
-            merged.append(current)
-    
-    return merged 
\ No newline at end of file
+            spans.append((start, end, 'merged' if absorbed else kind))
+            start, end, kind = current.start, current.end, current.type
+            absorbed = False
+    spans.append((start, end, 'merged' if absorbed else kind))
+
+    return [
+        Region(s, e, t, source_text)
+        for s, e, t in spans
+    ]